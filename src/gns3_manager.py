@@ -1,7 +1,11 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
 from typing import Union, Dict
 
+_HOSTNAME_RE = re.compile(rb"[ \t]*hostname\s+(\S+)", re.IGNORECASE)
+
 class Gns3Manager:
     def __init__(self, project_path: Union[str, Path]) -> None:
         # Initialize paths and verify Dynamips directory exists
@@ -20,46 +24,80 @@ class Gns3Manager:
         if missing:
             raise ValueError(f"Missing routers: {', '.join(missing)}")
 
+        # Encode every config before touching any file, so a bad config cannot leave a half-written project
+        payloads = {}
         for host, cfg in router_configs.items():
             try:
-                Path(existing[host]).write_text(cfg)
+                if not isinstance(cfg, str):
+                    raise TypeError(f"data must be str, not {type(cfg).__name__}")
+                payloads[host] = (existing[host], cfg.encode("utf-8"))
             except Exception as e:
                 raise IOError(f"Failed to write config for {host}: {e}")
 
+        # Write files concurrently, then surface the first failure in router order
+        with ThreadPoolExecutor() as executor:
+            writes = {host: executor.submit(self.__write_file, *payload) for host, payload in payloads.items()}
+        for host, write in writes.items():
+            try:
+                write.result()
+            except Exception as e:
+                raise IOError(f"Failed to write config for {host}: {e}")
+
+    @staticmethod
+    def __write_file(path: str, data: bytes) -> None:
+        # Truncate and write pre-encoded bytes with raw fd calls, bypassing the text layer
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
     def __get_existing_router_configs(self) -> Dict[str, str]:
         # Scan Dynamips folders, extract hostnames, and map names to cfg paths
         configs: Dict[str, str] = {}
-        for router_dir in self.__dynamips_path.iterdir():
-            if not router_dir.is_dir():
-                continue
+        with os.scandir(self.__dynamips_path) as router_dirs:
+            for router_dir in router_dirs:
+                if not router_dir.is_dir(follow_symlinks=False):
+                    continue
 
-            cfg_dir = router_dir / "configs"
-            if not cfg_dir.exists():
-                raise ValueError(f"Missing 'configs' directory in {router_dir}")
+                cfg_dir = os.path.join(router_dir.path, "configs")
+                try:
+                    with os.scandir(cfg_dir) as entries:
+                        files = [e.path for e in entries if e.name.endswith("_startup-config.cfg")]
+                except FileNotFoundError:
+                    raise ValueError(f"Missing 'configs' directory in {router_dir.path}")
+                except NotADirectoryError:
+                    # A 'configs' file holds no startup-config, reported like an empty folder
+                    files = []
 
-            files = list(cfg_dir.glob("*_startup-config.cfg"))
-            if len(files) != 1:
-                raise ValueError(f"Expected 1 cfg in {cfg_dir}, found {len(files)}")
+                if len(files) != 1:
+                    raise ValueError(f"Expected 1 cfg in {cfg_dir}, found {len(files)}")
 
-            cfg_file = files[0]
-            hostname = self.__extract_hostname(cfg_file)
-            if not hostname:
-                raise ValueError(f"No hostname found in {cfg_file}")
+                cfg_file = files[0]
+                hostname = self.__extract_hostname(cfg_file)
+                if not hostname:
+                    raise ValueError(f"No hostname found in {cfg_file}")
 
-            configs[hostname] = str(cfg_file)
+                configs[hostname] = cfg_file
 
         if not configs:
             raise ValueError(f"No router configs found in {self.__dynamips_path}")
 
         return configs
 
-    def __extract_hostname(self, path: Path) -> Union[str, None]:
+    def __extract_hostname(self, path: str) -> Union[str, None]:
         # Return the first 'hostname <name>' match, case-insensitive
         try:
-            for line in path.read_text().splitlines():
-                match = re.match(r"^hostname\s+(\S+)", line, re.IGNORECASE)
-                if match:
-                    return match.group(1)
+            # Stream the header only: hostname precedes any interface/router section
+            with open(path, "rb") as f:
+                for line in f:
+                    match = _HOSTNAME_RE.match(line)
+                    if match:
+                        return match.group(1).decode("utf-8")
+                    if line.startswith((b"interface ", b"router ")):
+                        return None
         except Exception as e:
             raise IOError(f"Error reading {path}: {e}")
         return None
@@ -1,5 +1,29 @@
 import ipaddress
 from datetime import datetime, timezone
+from socket import inet_aton, inet_ntoa
+from struct import pack, unpack
+
+# Static config sections shared by every router, pre-joined line blocks
+_HEADER_TEMPLATE = "\n".join((
+    '!', '!', '!', '! Last configuration change at {now}', '!', 'version 15.2',
+    'service timestamps debug datetime msec', 'service timestamps log datetime msec',
+    '!', 'hostname {hostname}', '!', 'no aaa new-model', 'ip cef', '!'
+))
+_OSPF_TEMPLATE = "router ospf 1\n router-id {rid}\n mpls ldp autoconfig\n!"
+_FOOTER = "\n".join((
+    'ip forward-protocol nd', '!', 'line con 0', ' exec-timeout 0 0',
+    ' privilege level 15', ' logging synchronous', '!', 'end'
+))
+
+
+# Format an IPv4Address as dotted-quad straight from its packed bytes
+def _ip_to_str(ip):
+    return inet_ntoa(ip.packed)
+
+
+# Mask a dotted-quad address with a dotted-quad netmask, on 32-bit integers
+def _network_address(ip, mask):
+    return inet_ntoa(pack('>I', unpack('>I', inet_aton(ip))[0] & unpack('>I', inet_aton(mask))[0]))
 
 
 class NetworkConfigGenerator:
@@ -8,22 +32,13 @@ class NetworkConfigGenerator:
         self.__as_map, self.__backbone_as_num = self.__init_as_map()
         self.__routers = self.__create_router_map()
         self.__assign_ips()
+        self.__pe_loopbacks = self.__pe_loopback_index()
 
-    # Initialize the AS map and IP address iterators
+    # Initialize the AS map (address iterators are created on first use)
     def __init_as_map(self):
         # Create a map AS_number → AS_details
         as_map = {a["as_number"]: a for a in self.__intent["as"]}
 
-        # Add iterators for Loopback and physical subnets
-        for num, a in as_map.items():
-            a["loopback_iter"] = (
-                ipaddress.IPv4Network(a["ipv4_ranges"]["loopback"]).hosts()
-                if "loopback" in a["ipv4_ranges"] else None
-            )
-            a["phys_iter"] = (
-                ipaddress.IPv4Network(a["ipv4_ranges"]["physical"]).subnets(new_prefix=24)
-            )
-
         # Identify the backbone AS
         backbone_as_num = next(num for num, a in as_map.items() if a.get("backbone", False))
         return as_map, backbone_as_num
@@ -42,194 +57,270 @@ class NetworkConfigGenerator:
                     "interfaces": { i["name"]: dict(i) for i in r["interfaces"] }
                 }
 
+                # Map each interface to its VRF name (first VRF listing it wins)
+                vrfs = routers[r["hostname"]]["vrfs"]
+                iface_vrf = {}
+                for vrf in vrfs:
+                    for name in vrf.get("associated_interfaces", []):
+                        iface_vrf.setdefault(name, vrf["name"])
+
                 if rtype == "CE":
                     routers[r["hostname"]]["private_network"] = r.get("private_network")
                     routers[r["hostname"]]["interfaces"]["Loopback0"] = {"name": "Loopback0"}
 
+                # Stamp name-derived flags once, instead of re-testing names per generation
+                interfaces = routers[r["hostname"]]["interfaces"]
+                for name, iface in interfaces.items():
+                    iface["_is_gig"] = "GigabitEthernet" in name
+                    iface["_is_loop"] = name == "Loopback0"
+
+                # Freeze the interface emission order, paired with each interface's VRF
+                if vrfs:
+                    iface_order = tuple((iface, iface_vrf.get(name)) for name, iface in interfaces.items())
+                else:
+                    iface_order = tuple((iface, None) for iface in interfaces.values())
+                routers[r["hostname"]]["iface_order"] = iface_order
+
         return routers
 
+    # Lazily create an AS address iterator: Loopback hosts or physical /24 subnets
+    def __get_pool(self, as_num, pool):
+        a = self.__as_map[as_num]
+        key = f"{pool}_iter"
+        if key not in a:
+            network = ipaddress.IPv4Network(a["ipv4_ranges"][pool])
+            a[key] = network.hosts() if pool == "loopback" else network.subnets(new_prefix=24)
+        return a[key]
+
+    # Draw the next value from an AS address pool, failing clearly once it is exhausted
+    def __next_from_pool(self, as_num, pool):
+        value = next(self.__get_pool(as_num, pool), None)
+        if value is None:
+            raise ValueError(f"Address pool '{pool}' exhausted for AS {as_num}")
+        return value
+
     # Assign IP addresses to Loopback and physical interfaces
     def __assign_ips(self):
         # Assign Loopback IPs
         for router in self.__routers.values():
             iface = router["interfaces"].get("Loopback0")
-            if iface and self.__as_map[router["as"]]["loopback_iter"]:
-                ip = str(next(self.__as_map[router["as"]]["loopback_iter"]))
-                iface.update({"ip": ip, "mask": "255.255.255.255", "internal": True})
+            if iface and "loopback" in self.__as_map[router["as"]]["ipv4_ranges"]:
+                ip = _ip_to_str(self.__next_from_pool(router["as"], "loopback"))
+                iface.update({"ip": ip, "mask": "255.255.255.255", "network_address": ip, "internal": True})
             elif router["type"] == "CE":
                 network = ipaddress.IPv4Network(router["private_network"])
-                iface.update({"ip": network.network_address.__str__(), "mask": network.netmask.__str__(), "internal": False, "ce_test": True})
+                ip = _ip_to_str(network.network_address)
+                iface.update({"ip": ip, "mask": _ip_to_str(network.netmask), "network_address": ip, "internal": False, "ce_test": True})
 
         # Assign physical IPs to links/subnets
+        routers = self.__routers
+        endpoint_link = self.__endpoint_link = {}
+        ce_uplink = self.__ce_uplink = {}
         for link in self.__intent["subnets"]:
-            if any(self.__routers[ep["router"]]["type"] == "CE" for ep in link):
-                ce_ep = next(ep for ep in link if self.__routers[ep["router"]]["type"] == "CE")
-                net = next(self.__as_map[self.__routers[ce_ep["router"]]["as"]]["phys_iter"])
-            else:
-                net = next(self.__as_map[self.__backbone_as_num]["phys_iter"])
-            hosts = list(net.hosts())
-
-            # Assign an address to each endpoint
+            # Links touching a CE draw from the CE's AS, others from the backbone; note the link's last PE
+            ce_router, pe_ep = None, None
+            for ep in link:
+                rtype = routers[ep["router"]]["type"]
+                if rtype == "CE" and ce_router is None:
+                    ce_router = routers[ep["router"]]
+                elif rtype == "PE":
+                    pe_ep = ep
+            net = self.__next_from_pool(ce_router["as"] if ce_router else self.__backbone_as_num, "physical")
+            network_address, network = _ip_to_str(net.network_address), net.with_prefixlen
+
+            # Assign an address to each endpoint, and index links by endpoint: (router, interface) → link
             for idx, ep in enumerate(link):
-                iface = self.__routers[ep["router"]]["interfaces"][ep["interface"]]
-                iface.update({
-                    "ip": str(hosts[idx]),
+                router = routers[ep["router"]]
+                router["interfaces"][ep["interface"]].update({
+                    "ip": _ip_to_str(net[idx + 1]),
                     "mask": "255.255.255.0",
-                    "mpls": self.__routers[ep["router"]]["type"] != "CE",
-                    "internal": self.__routers[ep["router"]]["type"] != "CE"
+                    "network_address": network_address,
+                    "network": network,
+                    "mpls": router["type"] != "CE",
+                    "internal": router["type"] != "CE"
                 })
+                endpoint_link[(ep["router"], ep["interface"])] = link
+
+                # Record the PE endpoint each CE peers with (last PE of the last link listed wins)
+                if pe_ep and router["type"] == "CE":
+                    ce_uplink[ep["router"]] = pe_ep
 
     # Build the configuration of an interface
-    def __build_interface_config(self, iface, as_num, vrf_name=None):
-        print(iface)
-        lines = [f"interface {iface['name']}"]
+    def __build_interface_config(self, append, iface, as_num, vrf_name=None):
+        append("interface " + iface['name'])
 
         # Add VRF if applicable
         if vrf_name:
-            lines.append(f" ip vrf forwarding {vrf_name}")
+            append(f" ip vrf forwarding {vrf_name}")
 
         # IP address
         if "ip" in iface:
-            lines.append(f" ip address {iface['ip']} {iface['mask']}")
+            append(f" ip address {iface['ip']} {iface['mask']}")
 
         # OSPF for internal or Loopback interfaces
-        if iface.get("internal") or iface['name'] == "Loopback0":
-            if not iface.get("ce_test"):
-                if not vrf_name:
-                    lines.append(f" ip ospf 1 area {as_num}")
-                    if "ospf_cost" in iface:
-                        lines.append(f" ip ospf cost {iface['ospf_cost']}")
+        if (iface.get("internal") or iface["_is_loop"]) and not iface.get("ce_test") and not vrf_name:
+            append(f" ip ospf 1 area {as_num}")
+            if "ospf_cost" in iface:
+                append(f" ip ospf cost {iface['ospf_cost']}")
 
         # Auto-negotiation for physical interfaces
-        if "GigabitEthernet" in iface['name']:
-            lines.append(" negotiation auto")
+        if iface["_is_gig"]:
+            append(" negotiation auto")
 
-        lines.append("!")
-        return lines
+        append("!")
+
+    # Find the endpoint of a given router type sharing the link of (router, iface)
+    def __find_peer(self, router_name, iface, rtype):
+        routers = self.__routers
+        for ep in self.__endpoint_link.get((router_name, iface), ()):
+            if ep['router'] != router_name and routers[ep['router']]['type'] == rtype:
+                return ep
+        return None
 
     # Find the CE router connected to a PE via a specific interface
     def __find_ce_peer(self, pe, iface):
-        for link in self.__intent["subnets"]:
-            if any(e['router'] == pe and e['interface'] == iface for e in link):
-                for ep in link:
-                    if ep['router'] != pe and self.__routers[ep['router']]['type'] == 'CE':
-                        ce = self.__routers[ep['router']]
-                        return ce['interfaces'][ep['interface']]['ip'], ce['as']
+        peer = self.__find_peer(pe, iface, 'CE')
+        if peer:
+            ce = self.__routers[peer['router']]
+            return ce['interfaces'][peer['interface']]['ip'], ce['as']
         return '0.0.0.0', 0
 
+    # List the (hostname, Loopback0 IP) pairs of all PE routers
+    def __pe_loopback_index(self):
+        return [(name, r['interfaces']['Loopback0']['ip']) for name, r in self.__routers.items() if r['type'] == 'PE']
+
     # Generate the MP-BGP configuration for a PE
-    def __generate_mpbgp(self, router_name):
+    def __generate_mpbgp(self, append, router_name):
         r = self.__routers[router_name]
-        lines = [f"router bgp {r['as']}", f" bgp router-id {r['interfaces']['Loopback0']['ip']}"]
-
-        # iBGP sessions between PE (vpnv4)
-        for peer_name, peer in self.__routers.items():
-            if peer['type'] == 'PE' and peer_name != router_name:
-                rip = peer['interfaces']['Loopback0']['ip']
-                lines += [f" neighbor {rip} remote-as {r['as']}", f" neighbor {rip} update-source Loopback0"]
+        as_num = r['as']
+        append(f"router bgp {as_num}")
+        append(f" bgp router-id {r['interfaces']['Loopback0']['ip']}")
+
+        # iBGP sessions between PE, collecting their vpnv4 activation in the same pass
+        vpnv4 = []
+        for peer_name, rip in self.__pe_loopbacks:
+            if peer_name == router_name:
+                continue
+            append(f" neighbor {rip} remote-as {as_num}")
+            append(f" neighbor {rip} update-source Loopback0")
+            vpnv4.append(f"  neighbor {rip} activate")
+            vpnv4.append(f"  neighbor {rip} send-community extended")
 
         # Enable vpnv4 address-family
-        lines += [" !", " address-family vpnv4"]
-        for peer_name, peer in self.__routers.items():
-            if peer['type'] == 'PE' and peer_name != router_name:
-                rip = peer['interfaces']['Loopback0']['ip']
-                lines += [f"  neighbor {rip} activate", f"  neighbor {rip} send-community extended"]
-        lines.append(" exit-address-family")
+        append(" !")
+        append(" address-family vpnv4")
+        for line in vpnv4:
+            append(line)
+        append(" exit-address-family")
 
         # Configure CE neighbors per VRF
+        find_ce_peer = self.__find_ce_peer
         for vrf in r['vrfs']:
-            ce_ip, ce_as = self.__find_ce_peer(router_name, vrf['associated_interfaces'][0])
-            lines += [
-                "!",
-                f" address-family ipv4 vrf {vrf['name']}",
-                f"  neighbor {ce_ip} remote-as {ce_as}",
-                f"  neighbor {ce_ip} activate",
-                " exit-address-family"
-            ]
-        lines.append("!")
-        return lines
+            ce_ip, ce_as = find_ce_peer(router_name, vrf['associated_interfaces'][0])
+            append("!")
+            append(f" address-family ipv4 vrf {vrf['name']}")
+            append(f"  neighbor {ce_ip} remote-as {ce_as}")
+            append(f"  neighbor {ce_ip} activate")
+            append(" exit-address-family")
+        append("!")
 
     # Generate BGP configuration for a CE
-    def __generate_ce_bgp(self, router_name):
-        ce = self.__routers[router_name]
+    def __generate_ce_bgp(self, append, router_name):
+        routers = self.__routers
+        ce = routers[router_name]
         pe_ip = '0.0.0.0'
 
         # Find the IP address of the connected PE
-        for link in self.__intent["subnets"]:
-            if any(e['router'] == router_name for e in link):
-                for ep in link:
-                    if ep['router'] != router_name and self.__routers[ep['router']]['type'] == 'PE':
-                        pe_ip = self.__routers[ep['router']]['interfaces'][ep['interface']]['ip']
+        peer = self.__ce_uplink.get(router_name)
+        if peer:
+            pe_ip = routers[peer['router']]['interfaces'][peer['interface']]['ip']
 
-        lines = [f"router bgp {ce['as']}", f" neighbor {pe_ip} remote-as {self.__backbone_as_num}"]
+        append(f"router bgp {ce['as']}")
+        append(f" neighbor {pe_ip} remote-as {self.__backbone_as_num}")
 
         # Add networks to advertise
         for iface in ce['interfaces'].values():
             if 'ip' in iface:
-                ip_net = ipaddress.IPv4Interface(f"{iface['ip']}/{iface['mask']}").network.network_address
-                lines.append(f" network {ip_net} mask {iface['mask']}")
+                mask = iface['mask']
+                ip_net = iface.get('network_address') or _network_address(iface['ip'], mask)
+                append(f" network {ip_net} mask {mask}")
 
-        lines.append("!")
-        return lines
+        append("!")
 
-    # PUBLIC METHOD: Generate the full configuration of a router
-    def generate_router_config(self, router_name):
-        now = datetime.now(timezone.utc).strftime('%H:%M:%S UTC %a %b %d %Y')
+    # Format the current UTC time as shown in the config header
+    def __timestamp(self):
+        return datetime.now(timezone.utc).strftime('%H:%M:%S UTC %a %b %d %Y')
+
+    # Generate the config header, including VRF definitions for a PE
+    def __generate_header(self, append, router_name, now):
         r = self.__routers[router_name]
-        lines = [
-            '!', '!', '!', f'! Last configuration change at {now}', '!', 'version 15.2',
-            'service timestamps debug datetime msec', 'service timestamps log datetime msec',
-            '!', f'hostname {router_name}', '!', 'no aaa new-model', 'ip cef', '!'
-        ]
+        append(_HEADER_TEMPLATE.format(now=now, hostname=router_name))
 
         # VRF configuration for PE
         if r['type'] == 'PE':
             for vrf in r['vrfs']:
-                lines += [f"ip vrf {vrf['name']}", f" rd {vrf['rd']}"]
-                lines += [f" route-target export {e}" for e in vrf['route_targets']['export']]
-                lines += [f" route-target import {i}" for i in vrf['route_targets']['import']]
-                lines.append('!')
+                append(f"ip vrf {vrf['name']}")
+                append(f" rd {vrf['rd']}")
+                for e in vrf['route_targets']['export']:
+                    append(f" route-target export {e}")
+                for i in vrf['route_targets']['import']:
+                    append(f" route-target import {i}")
+                append('!')
+
+    # Generate the configuration of every interface of a router
+    def __generate_interfaces(self, append, router_name):
+        r = self.__routers[router_name]
+        as_num = r['as']
+        build = self.__build_interface_config
+        for iface, vrf_name in r['iface_order']:
+            build(append, iface, as_num, vrf_name)
+
+    # PUBLIC METHOD: Generate the full configuration of a router
+    def generate_router_config(self, router_name, now=None):
+        if now is None:
+            now = self.__timestamp()
+        r = self.__routers[router_name]
+        rtype = r['type']
 
-        # Interfaces
-        for name, iface in r['interfaces'].items():
-            vrf = next((v['name'] for v in r['vrfs'] if name in v.get('associated_interfaces', [])), None)
-            lines += self.__build_interface_config(iface, r['as'], vrf)
+        # Every section appends straight into this single line buffer
+        out = []
+        append = out.append
+        self.__generate_header(append, router_name, now)
+        self.__generate_interfaces(append, router_name)
 
         # OSPF/MPLS for PE and P
-        if r['type'] in ('PE', 'P'):
-            rid = r['interfaces']['Loopback0']['ip']
-            lines += ['router ospf 1', f' router-id {rid}', ' mpls ldp autoconfig', '!']
+        if rtype in ('PE', 'P'):
+            append(_OSPF_TEMPLATE.format(rid=r['interfaces']['Loopback0']['ip']))
 
         # BGP depending on type
-        if r['type'] == 'PE':
-            lines += self.__generate_mpbgp(router_name)
-        elif r['type'] == 'CE':
-            lines += self.__generate_ce_bgp(router_name)
+        if rtype == 'PE':
+            self.__generate_mpbgp(append, router_name)
+        elif rtype == 'CE':
+            self.__generate_ce_bgp(append, router_name)
 
-        lines += [
-            'ip forward-protocol nd', '!', 'line con 0', ' exec-timeout 0 0',
-            ' privilege level 15', ' logging synchronous', '!', 'end'
-        ]
-        return "\n".join(lines)
+        append(_FOOTER)
+        return "\n".join(out)
 
     # PUBLIC METHOD: Generate configurations for all routers
     def generate_all_configs(self):
-        return {r: self.generate_router_config(r) for r in self.__routers}
+        now = self.__timestamp()
+        return {r: self.generate_router_config(r, now) for r in self.__routers}
 
     # PUBLIC METHOD: Generate a recap of all network subnets and their associated routers/interfaces
     def generate_network_recap(self):
-        lines = []
+        routers = self.__routers
+        chunks = []
 
         for link in self.__intent.get("subnets", []):
             # Identify subnet from first endpoint (sufficient since all share it)
             first_ep = link[0]
-            subnet_ip = self.__routers[first_ep["router"]]["interfaces"][first_ep["interface"]]["ip"]
-            subnet_mask = self.__routers[first_ep["router"]]["interfaces"][first_ep["interface"]]["mask"]
-            network = ipaddress.IPv4Interface(f"{subnet_ip}/{subnet_mask}").network
+            network = routers[first_ep["router"]]["interfaces"][first_ep["interface"]]["network"]
 
-            lines.append(f"\nSubnet: {network.with_prefixlen}")
-            for ep in link:
-                iface = self.__routers[ep["router"]]["interfaces"][ep["interface"]]
-                lines.append(f"  - Router: {ep['router']} | Interface: {ep['interface']} | IP: {iface['ip']}")
+            chunks.append(f"\nSubnet: {network}")
+            chunks.extend(
+                f"  - Router: {ep['router']} | Interface: {ep['interface']} | "
+                f"IP: {routers[ep['router']]['interfaces'][ep['interface']]['ip']}"
+                for ep in link
+            )
 
-        return "\n".join(lines) if len(lines) > 1 else "No network links defined."
+        return "\n".join(chunks) if chunks else "No network links defined."